@@ -7,60 +7,117 @@ The shim downloads the actual binary at runtime, so we only need to update
 the package version.
 """
 
+import argparse
 import sys
 import re
+import hashlib
 from pathlib import Path
+import urllib.error
 import urllib.request
 
 BASE_URL = "https://storage.googleapis.com/claude-code-dist-86c565f3-f756-42ad-8dfa-d59b1c096819/claude-code-releases"
 RECIPE_PATH = Path("recipes/claude-code/recipe.yaml")
-
-def get_version(version_arg: str | None = None) -> str:
-    """Get Claude Code version - either from argument or fetch latest."""
+CACHE_DIR = Path(".cache")
+
+# Recipe rewrite patterns, compiled once at import
+_VERSION_RE = re.compile(r'version: "([^"]+)"')
+_NUMBER_RE = re.compile(r'number: \d+')
+
+def _cached_get(url: str) -> bytes:
+    """Fetch a URL through a small on-disk ETag cache under .cache/.
+
+    Sends If-None-Match when a cached copy exists; on a 304 response the
+    cached body is reused and no payload is transferred.
+    """
+    body_path = CACHE_DIR / hashlib.sha1(url.encode()).hexdigest()
+    etag_path = body_path.with_suffix(".etag")
+    headers = {}
+    if body_path.exists() and etag_path.exists():
+        headers["If-None-Match"] = etag_path.read_text()
+    request = urllib.request.Request(url, headers=headers)
+    try:
+        with urllib.request.urlopen(request) as response:
+            body = response.read()
+            etag = response.headers.get("ETag")
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return body_path.read_bytes()
+        raise
+    if etag:
+        CACHE_DIR.mkdir(exist_ok=True)
+        body_path.write_bytes(body)
+        etag_path.write_text(etag)
+    return body
+
+def get_version(version_arg: str | None = None, channel: str = "latest") -> str:
+    """Get Claude Code version - either from argument or fetch from the channel."""
     if version_arg:
         return version_arg
 
     try:
-        with urllib.request.urlopen(f"{BASE_URL}/latest") as response:
-            return response.read().decode().strip()
+        return _cached_get(f"{BASE_URL}/{channel}").decode().strip()
     except Exception as e:
-        print(f"❌ Failed to fetch latest version: {e}")
+        print(f"❌ Failed to fetch {channel} version: {e}")
         sys.exit(1)
 
-def update_recipe(version: str) -> None:
-    """Update the recipe.yaml file with new version."""
+def read_recipe() -> str:
+    """Read the recipe once up front; everything downstream works on the text."""
     if not RECIPE_PATH.exists():
         print(f"❌ Recipe file not found: {RECIPE_PATH}")
         sys.exit(1)
+    return RECIPE_PATH.read_text()
 
-    recipe = RECIPE_PATH.read_text()
+def update_recipe(version: str, recipe: str) -> None:
+    """Update the recipe text with the new version and write it back if changed."""
+    original = recipe
 
     # Check current version
-    current_version_match = re.search(r'version: "([^"]+)"', recipe)
+    current_version_match = _VERSION_RE.search(recipe)
     current_version = current_version_match.group(1) if current_version_match else None
 
     # Update version
-    recipe = re.sub(r'version: "[^"]+"', f'version: "{version}"', recipe, count=1)
+    recipe = _VERSION_RE.sub(f'version: "{version}"', recipe, count=1)
 
     # Only reset build number if the version actually changed
     if current_version != version:
-        recipe = re.sub(r'number: \d+', 'number: 0', recipe)
+        number_match = _NUMBER_RE.search(recipe)
+        if number_match:
+            recipe = recipe.replace(number_match.group(0), "number: 0")
         print(f"✅ Updated package version to {version} and reset build number to 0")
     else:
         print(f"✅ Version {version} is already current, keeping existing build number")
 
-    RECIPE_PATH.write_text(recipe)
+    if recipe != original:
+        RECIPE_PATH.write_text(recipe)
 
 def main():
     """Main function to update Claude Code recipe."""
+    parser = argparse.ArgumentParser(description="Update the claude-code shim recipe")
+    parser.add_argument("version", nargs="?", help="explicit version (skips the channel lookup)")
+    parser.add_argument(
+        "--channel",
+        choices=("stable", "latest"),
+        default="latest",
+        help="release channel to query when no version is given (default: latest)",
+    )
+    args = parser.parse_args()
+
     print("🔄 Updating Claude Code shim package...")
 
-    # Get version from command line or fetch latest
-    version = get_version(sys.argv[1] if len(sys.argv) > 1 else None)
+    recipe = read_recipe()
+
+    # Get version from command line or fetch from the release channel
+    version = get_version(args.version, args.channel)
     print(f"📦 Target version: {version}")
 
+    # Nothing to rewrite when the recipe is already at this version
+    current_version_match = _VERSION_RE.search(recipe)
+    if current_version_match and current_version_match.group(1) == version:
+        print(f"✅ Version {version} is already current, nothing to update")
+        return
+
     # Update the recipe
-    update_recipe(version)
+    update_recipe(version, recipe)
 
     print("🎉 Claude Code shim package update complete!")
     print(f"   The shim will download Claude Code {version} on first run.")
@@ -10,12 +10,22 @@ import sys
 import re
 import json
 import hashlib
+import ssl
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+import urllib.error
 import urllib.request
 
+# One opener shared by every request; the shared TLS context caches sessions,
+# so repeat connections to the same host resume instead of doing a full handshake
+_OPENER = urllib.request.build_opener(
+    urllib.request.HTTPSHandler(context=ssl.create_default_context())
+)
+
 GITHUB_REPO = "skevetter/devpod"
 GITHUB_API_URL = f"https://api.github.com/repos/{GITHUB_REPO}/releases/latest"
 RECIPE_PATH = Path("recipes/devpod/recipe.yaml")
+CACHE_DIR = Path(".cache")
 
 # Platform-specific binary names
 PLATFORM_BINARIES = {
@@ -26,15 +36,64 @@ PLATFORM_BINARIES = {
     "win-64": "devpod-windows-amd64.exe",
 }
 
+# Map recipe selector comments to conda platforms
+SELECTOR_MAP = {
+    "linux and x86_64": "linux-64",
+    "linux and aarch64": "linux-aarch64",
+    "osx and x86_64": "osx-64",
+    "osx and arm64": "osx-arm64",
+    "win": "win-64",
+}
+
+# Recipe rewrite patterns, compiled once at import
+_VERSION_RE = re.compile(r'version: "([^"]+)"')
+_PKG_VERSION_RE = re.compile(r'(package:\s*\n\s*name:[^\n]*\n\s*version:\s*)"[^"]+"')
+_NUMBER_RE = re.compile(r'number: \d+')
+_SHA_LINE_RE = re.compile(r'^(\s*sha256:\s*)[\da-f]{64}(\s*#\s*\[([^\]]+)\])', re.MULTILINE)
+
+
+def _cached_get(url: str) -> bytes:
+    """Fetch a URL through a small on-disk ETag cache under .cache/.
+
+    Sends If-None-Match when a cached copy exists; GitHub answers with a
+    bodyless 304 (which also doesn't count against the rate limit) and the
+    cached body is reused.
+    """
+    body_path = CACHE_DIR / hashlib.sha1(url.encode()).hexdigest()
+    etag_path = body_path.with_suffix(".etag")
+    headers = {}
+    if body_path.exists() and etag_path.exists():
+        headers["If-None-Match"] = etag_path.read_text()
+    request = urllib.request.Request(url, headers=headers)
+    try:
+        with _OPENER.open(request) as response:
+            body = response.read()
+            etag = response.headers.get("ETag")
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return body_path.read_bytes()
+        raise
+    if etag:
+        CACHE_DIR.mkdir(exist_ok=True)
+        body_path.write_bytes(body)
+        etag_path.write_text(etag)
+    return body
+
 
 def get_latest_release():
     """Fetch the latest release information from GitHub API."""
     try:
-        with urllib.request.urlopen(GITHUB_API_URL) as response:
-            data = json.loads(response.read().decode())
-            version = data["tag_name"].lstrip("v")
-            assets = {asset["name"]: asset["browser_download_url"] for asset in data["assets"]}
-            return version, assets
+        data = json.loads(_cached_get(GITHUB_API_URL))
+        version = data["tag_name"].lstrip("v")
+        # Only keep the binaries the recipe ships; releases also carry
+        # checksum files, archives and installers we never touch
+        needed = set(PLATFORM_BINARIES.values())
+        assets = {
+            asset["name"]: asset["browser_download_url"]
+            for asset in data["assets"]
+            if asset["name"] in needed
+        }
+        return version, assets
     except Exception as e:
         print(f"❌ Failed to fetch latest release: {e}")
         sys.exit(1)
@@ -49,17 +108,31 @@ def get_version(version_arg: str | None = None):
     return version, assets
 
 
+try:
+    _file_digest = hashlib.file_digest  # Python 3.11+, hashes file objects entirely in C
+except AttributeError:
+    def _file_digest(fileobj, algorithm):
+        digest = hashlib.new(algorithm)
+        for chunk in iter(lambda: fileobj.read(1 << 20), b""):
+            digest.update(chunk)
+        return digest
+
+
+def read_recipe() -> str:
+    """Read the recipe once up front; everything downstream works on the text."""
+    if not RECIPE_PATH.exists():
+        print(f"❌ Recipe file not found: {RECIPE_PATH}")
+        sys.exit(1)
+    return RECIPE_PATH.read_text()
+
+
 def download_and_hash(url: str) -> str:
-    """Download a file and return its SHA256 hash."""
-    print(f"  📥 Downloading {url.split('/')[-1]}...")
+    """Download a file and return its SHA256 hash, hashing as it streams in."""
     try:
-        with urllib.request.urlopen(url) as response:
-            data = response.read()
-            sha256_hash = hashlib.sha256(data).hexdigest()
-            print(f"  ✅ SHA256: {sha256_hash}")
-            return sha256_hash
+        with _OPENER.open(url) as response:
+            return _file_digest(response, "sha256").hexdigest()
     except Exception as e:
-        print(f"  ⚠️  Failed to download: {e}")
+        print(f"  ⚠️  Failed to download {url.split('/')[-1]}: {e}")
         return ""
 
 
@@ -74,81 +147,93 @@ def get_checksums(version: str, assets: dict | None = None) -> dict[str, str]:
 
     print("📦 Fetching checksums for all platforms...")
 
+    targets = []
     for platform, binary_name in PLATFORM_BINARIES.items():
         if binary_name in assets:
-            url = assets[binary_name]
-            checksums[platform] = download_and_hash(url)
+            targets.append((platform, assets[binary_name]))
         else:
             print(f"  ⚠️  Binary not found for {platform}: {binary_name}")
             checksums[platform] = ""
 
-    return checksums
+    # The downloads are network-bound, so fetch all platform binaries in parallel
+    with ThreadPoolExecutor(max_workers=len(PLATFORM_BINARIES)) as executor:
+        hashes = executor.map(download_and_hash, [url for _, url in targets])
+        for (platform, url), sha256_hash in zip(targets, hashes):
+            if sha256_hash:
+                print(f"  ✅ {url.split('/')[-1]}: {sha256_hash}")
+            checksums[platform] = sha256_hash
 
+    return checksums
 
-def update_recipe(version: str, checksums: dict[str, str]) -> None:
-    """Update the recipe.yaml file with new version and checksums."""
-    if not RECIPE_PATH.exists():
-        print(f"❌ Recipe file not found: {RECIPE_PATH}")
-        sys.exit(1)
 
-    recipe = RECIPE_PATH.read_text()
+def update_recipe(version: str, checksums: dict[str, str], recipe: str) -> None:
+    """Update the recipe text with new version and checksums, writing back if changed."""
+    original = recipe
 
     # Check current version
-    current_version_match = re.search(r'version: "([^"]+)"', recipe)
+    current_version_match = _VERSION_RE.search(recipe)
     current_version = current_version_match.group(1) if current_version_match else None
 
     # Update version in package section
-    recipe = re.sub(r'(package:.*?version:\s*)"[^"]+"', f'\\1"{version}"', recipe, count=1, flags=re.DOTALL)
+    recipe = _PKG_VERSION_RE.sub(f'\\1"{version}"', recipe, count=1)
 
-    # Update version in all URLs
+    # Update version in all URLs (a literal swap, no regex needed)
     if current_version:
-        recipe = re.sub(
-            rf'(https://github.com/{GITHUB_REPO}/releases/download/v){current_version}(/)',
-            rf'\g<1>{version}\g<2>',
-            recipe
+        recipe = recipe.replace(
+            f"/releases/download/v{current_version}/",
+            f"/releases/download/v{version}/",
         )
 
-    # Update checksums for each platform
-    selector_map = {
-        "linux and x86_64": "linux-64",
-        "linux and aarch64": "linux-aarch64",
-        "osx and x86_64": "osx-64",
-        "osx and arm64": "osx-arm64",
-        "win": "win-64",
-    }
-
-    for selector, platform in selector_map.items():
-        if platform in checksums and checksums[platform]:
-            # Match sha256 line with specific selector
-            pattern = rf'(sha256:\s*)[\da-f]{{64}}(\s*#\s*\[{re.escape(selector)}\])'
-            replacement = rf'\g<1>{checksums[platform]}\g<2>'
-            recipe = re.sub(pattern, replacement, recipe)
-            print(f"  ✅ Updated checksum for {platform}")
+    # Update checksums for all platforms in a single pass over the recipe
+    updated_platforms = []
+
+    def replace_sha(match):
+        platform = SELECTOR_MAP.get(match.group(3))
+        checksum = checksums.get(platform, "") if platform else ""
+        if not checksum:
+            return match.group(0)
+        updated_platforms.append(platform)
+        return match.group(1) + checksum + match.group(2)
+
+    recipe = _SHA_LINE_RE.sub(replace_sha, recipe)
+    for platform in updated_platforms:
+        print(f"  ✅ Updated checksum for {platform}")
 
     # Reset build number if version changed
     if current_version != version:
-        recipe = re.sub(r'number: \d+', 'number: 0', recipe)
+        number_match = _NUMBER_RE.search(recipe)
+        if number_match:
+            recipe = recipe.replace(number_match.group(0), "number: 0")
         print(f"✅ Updated package version to {version} and reset build number to 0")
     else:
         print(f"✅ Version {version} is already current, keeping existing build number")
 
-    RECIPE_PATH.write_text(recipe)
+    if recipe != original:
+        RECIPE_PATH.write_text(recipe)
 
 
 def main():
     """Main function to update DevPod recipe."""
     print("🔄 Updating DevPod package...")
 
+    recipe = read_recipe()
+
     # Get version from command line or fetch latest
     version_arg = sys.argv[1] if len(sys.argv) > 1 else None
     version, assets = get_version(version_arg)
     print(f"📦 Target version: {version}")
 
+    # Skip the downloads entirely when the recipe is already at this version
+    current_version_match = _VERSION_RE.search(recipe)
+    if current_version_match and current_version_match.group(1) == version:
+        print(f"✅ Version {version} is already current, nothing to update")
+        return
+
     # Get checksums for all platforms
     checksums = get_checksums(version, assets)
 
     # Update the recipe
-    update_recipe(version, checksums)
+    update_recipe(version, checksums, recipe)
 
     print("🎉 DevPod package update complete!")
 
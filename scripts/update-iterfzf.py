@@ -24,12 +24,34 @@ PLATFORM_MAP = {
     "win-64": "win_amd64",
 }
 
+# Map recipe selector comments to conda platforms
+SELECTOR_MAP = {
+    "linux and x86_64": "linux-64",
+    "linux and aarch64": "linux-aarch64",
+    "osx and x86_64": "osx-64",
+    "osx and arm64": "osx-arm64",
+    "win and x86_64": "win-64",
+}
+
+# Recipe rewrite patterns, compiled once at import
+_VERSION_RE = re.compile(r'version: "([^"]+)"')
+_PKG_VERSION_RE = re.compile(r'(package:\s*\n\s*name:[^\n]*\n\s*version:\s*)"[^"]+"')
+_NUMBER_RE = re.compile(r'number: \d+')
+_URL_RES = {
+    platform: re.compile(rf'^(\s*-\s*url:\s*)https://\S+(\s*#\s*\[{re.escape(selector)}\])', re.MULTILINE)
+    for selector, platform in SELECTOR_MAP.items()
+}
+_SHA_RES = {
+    platform: re.compile(rf'^(\s*sha256:\s*)[\da-f]{{64}}(\s*#\s*\[{re.escape(selector)}\])', re.MULTILINE)
+    for selector, platform in SELECTOR_MAP.items()
+}
+
 
 def get_latest_release():
     """Fetch the latest release information from PyPI."""
     try:
         with urllib.request.urlopen(PYPI_URL) as response:
-            data = json.loads(response.read().decode())
+            data = json.loads(response.read())
             version = data["info"]["version"]
             urls = data["urls"]
             return version, urls
@@ -38,46 +60,47 @@ def get_latest_release():
         sys.exit(1)
 
 
-def get_wheel_info(urls: list, platform_tag: str) -> tuple[str, str] | None:
-    """Find the wheel URL and SHA256 for a specific platform tag."""
+def index_wheels(urls: list) -> dict[str, tuple[str, str]]:
+    """Index wheel URL and SHA256 by platform tag in a single scan of the release."""
+    wheels = {}
     for url_info in urls:
-        if url_info["packagetype"] == "bdist_wheel":
-            filename = url_info["filename"]
-            if platform_tag in filename:
-                return url_info["url"], url_info["digests"]["sha256"]
-    return None
+        if url_info["packagetype"] != "bdist_wheel":
+            continue
+        filename = url_info["filename"]
+        for tag in PLATFORM_MAP.values():
+            if tag in filename:
+                wheels[tag] = (url_info["url"], url_info["digests"]["sha256"])
+                break
+    return wheels
 
 
-def update_recipe(version: str, urls: list) -> None:
-    """Update the recipe.yaml file with new version and checksums."""
+def read_recipe() -> str:
+    """Read the recipe once up front; everything downstream works on the text."""
     if not RECIPE_PATH.exists():
         print(f"❌ Recipe file not found: {RECIPE_PATH}")
         sys.exit(1)
+    return RECIPE_PATH.read_text()
 
-    recipe = RECIPE_PATH.read_text()
+
+def update_recipe(version: str, urls: list, recipe: str) -> None:
+    """Update the recipe text with new version and checksums, writing back if changed."""
+    original = recipe
 
     # Get current version
-    current_version_match = re.search(r'version: "([^"]+)"', recipe)
+    current_version_match = _VERSION_RE.search(recipe)
     current_version = current_version_match.group(1) if current_version_match else None
 
     # Update version in package section
-    recipe = re.sub(r'(package:.*?version:\s*)"[^"]+"', f'\\1"{version}"', recipe, count=1, flags=re.DOTALL)
+    recipe = _PKG_VERSION_RE.sub(f'\\1"{version}"', recipe, count=1)
 
     # Update each platform's wheel URL and checksum
-    selector_map = {
-        "linux and x86_64": "linux-64",
-        "linux and aarch64": "linux-aarch64",
-        "osx and x86_64": "osx-64",
-        "osx and arm64": "osx-arm64",
-        "win and x86_64": "win-64",
-    }
-
-    for selector, conda_platform in selector_map.items():
+    wheels = index_wheels(urls)
+    for conda_platform in SELECTOR_MAP.values():
         platform_tag = PLATFORM_MAP.get(conda_platform)
         if not platform_tag:
             continue
 
-        wheel_info = get_wheel_info(urls, platform_tag)
+        wheel_info = wheels.get(platform_tag)
         if not wheel_info:
             print(f"  ⚠️  No wheel found for {conda_platform}")
             continue
@@ -86,14 +109,12 @@ def update_recipe(version: str, urls: list) -> None:
         print(f"  ✅ Found wheel for {conda_platform}: {sha256[:16]}...")
 
         # Update URL line with this selector
-        url_pattern = rf'(-\s*url:\s*)https://[^\s]+(\s*#\s*\[{re.escape(selector)}\])'
         url_replacement = rf'\g<1>{wheel_url}\g<2>'
-        recipe = re.sub(url_pattern, url_replacement, recipe)
+        recipe = _URL_RES[conda_platform].sub(url_replacement, recipe)
 
         # Update SHA256 line with this selector
-        sha_pattern = rf'(sha256:\s*)[\da-f]{{64}}(\s*#\s*\[{re.escape(selector)}\])'
         sha_replacement = rf'\g<1>{sha256}\g<2>'
-        recipe = re.sub(sha_pattern, sha_replacement, recipe)
+        recipe = _SHA_RES[conda_platform].sub(sha_replacement, recipe)
 
     # Update version in build script wheel filenames
     if current_version:
@@ -101,18 +122,23 @@ def update_recipe(version: str, urls: list) -> None:
 
     # Reset build number if version changed
     if current_version != version:
-        recipe = re.sub(r'number: \d+', 'number: 0', recipe)
+        number_match = _NUMBER_RE.search(recipe)
+        if number_match:
+            recipe = recipe.replace(number_match.group(0), "number: 0")
         print(f"✅ Updated package version from {current_version} to {version}")
     else:
         print(f"✅ Version {version} is already current")
 
-    RECIPE_PATH.write_text(recipe)
+    if recipe != original:
+        RECIPE_PATH.write_text(recipe)
 
 
 def main():
     """Main function to update iterfzf recipe."""
     print("🔄 Updating iterfzf package...")
 
+    recipe = read_recipe()
+
     # Get version from command line or fetch latest
     if len(sys.argv) > 1:
         version = sys.argv[1]
@@ -120,7 +146,7 @@ def main():
         url = f"https://pypi.org/pypi/iterfzf/{version}/json"
         try:
             with urllib.request.urlopen(url) as response:
-                data = json.loads(response.read().decode())
+                data = json.loads(response.read())
                 urls = data["urls"]
         except Exception as e:
             print(f"❌ Failed to fetch version {version}: {e}")
@@ -131,7 +157,7 @@ def main():
     print(f"📦 Target version: {version}")
 
     # Update the recipe
-    update_recipe(version, urls)
+    update_recipe(version, urls, recipe)
 
     print("🎉 iterfzf package update complete!")
 
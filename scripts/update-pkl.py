@@ -26,12 +26,27 @@ PLATFORM_BINARIES = {
     "win-64": "pkl-windows-amd64.exe",
 }
 
+# Map recipe selector comments to conda platforms
+SELECTOR_MAP = {
+    "linux and x86_64": "linux-64",
+    "linux and aarch64": "linux-aarch64",
+    "osx and x86_64": "osx-64",
+    "osx and arm64": "osx-arm64",
+    "win": "win-64",
+}
+
+# Per-platform sha256 patterns, escaped and compiled once at import
+_SHA_RES = {
+    platform: re.compile(rf'(sha256:\s*)[\da-f]{{64}}(\s*#\s*\[{re.escape(selector)}\])')
+    for selector, platform in SELECTOR_MAP.items()
+}
+
 
 def get_latest_release():
     """Fetch the latest release information from GitHub API."""
     try:
         with urllib.request.urlopen(GITHUB_API_URL) as response:
-            data = json.loads(response.read().decode())
+            data = json.loads(response.read())
             # pkl uses bare version numbers (e.g., "0.30.2"), no v prefix
             version = data["tag_name"]
             assets = {asset["name"]: asset["browser_download_url"] for asset in data["assets"]}
@@ -51,12 +66,17 @@ def get_version(version_arg: str | None = None):
 
 
 def download_and_hash(url: str) -> str:
-    """Download a file and return its SHA256 hash."""
+    """Download a file and return its SHA256 hash, hashing as it streams in."""
     print(f"  Downloading {url.split('/')[-1]}...")
     try:
         with urllib.request.urlopen(url) as response:
-            data = response.read()
-            sha256_hash = hashlib.sha256(data).hexdigest()
+            digest = hashlib.sha256()
+            # Bind the hot-loop methods once; 1 MiB chunks keep the work in C
+            update = digest.update
+            read = response.read
+            while chunk := read(1 << 20):
+                update(chunk)
+            sha256_hash = digest.hexdigest()
             print(f"  SHA256: {sha256_hash}")
             return sha256_hash
     except Exception as e:
@@ -101,29 +121,19 @@ def update_recipe(version: str, checksums: dict[str, str]) -> None:
     # Update version in package section
     recipe = re.sub(r'(package:.*?version:\s*)"[^"]+"', f'\\1"{version}"', recipe, count=1, flags=re.DOTALL)
 
-    # Update version in all URLs (pkl uses bare version, no v prefix)
+    # Update version in all URLs (pkl uses bare version, no v prefix;
+    # a literal swap, no regex needed)
     if current_version:
-        recipe = re.sub(
-            rf'(https://github.com/{GITHUB_REPO}/releases/download/){current_version}(/)',
-            rf'\g<1>{version}\g<2>',
-            recipe
+        recipe = recipe.replace(
+            f"/releases/download/{current_version}/",
+            f"/releases/download/{version}/",
         )
 
     # Update checksums for each platform
-    selector_map = {
-        "linux and x86_64": "linux-64",
-        "linux and aarch64": "linux-aarch64",
-        "osx and x86_64": "osx-64",
-        "osx and arm64": "osx-arm64",
-        "win": "win-64",
-    }
-
-    for selector, platform in selector_map.items():
-        if platform in checksums and checksums[platform]:
-            # Match sha256 line with specific selector
-            pattern = rf'(sha256:\s*)[\da-f]{{64}}(\s*#\s*\[{re.escape(selector)}\])'
+    for platform, sha_re in _SHA_RES.items():
+        if checksums.get(platform):
             replacement = rf'\g<1>{checksums[platform]}\g<2>'
-            recipe = re.sub(pattern, replacement, recipe)
+            recipe = sha_re.sub(replacement, recipe)
             print(f"  Updated checksum for {platform}")
 
     # Reset build number if version changed
@@ -6,14 +6,51 @@ This script fetches the latest release from GitHub and updates the recipe
 with new version and SHA256 checksums.
 """
 
+import argparse
 import json
 import re
 import sys
-import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 from pathlib import Path
 
+# orjson parses the release JSON ~3x faster when available; the stdlib
+# decoder also accepts bytes, so the two are interchangeable here
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    _json_loads = json.loads
+
+# Built lazily so the --help and already-current paths never pay for
+# importing the urllib/ssl stack
+_OPENER = None
+
+
+def _opener():
+    """Build the shared opener on first use.
+
+    One opener serves every request; the shared TLS context caches sessions,
+    so repeat connections to the same host resume instead of doing a full
+    handshake.
+    """
+    global _OPENER
+    if _OPENER is None:
+        import ssl
+        import urllib.request
+
+        _OPENER = urllib.request.build_opener(
+            urllib.request.HTTPSHandler(context=ssl.create_default_context())
+        )
+    return _OPENER
+
 GITHUB_REPO = "mikeyobrien/ralph-orchestrator"
 RECIPE_PATH = Path("recipes/ralph-orchestrator/recipe.yaml")
+# ETag plus the last fetched version/checksums, so an unchanged release
+# costs one 304 round trip and no checksum fetches
+CACHE_PATH = RECIPE_PATH.with_name(".update-cache.json")
+
+# ETag of the release response fetched during this run, saved with the checksums
+_fresh_etag = None
 
 # Mapping of platform conditions to release asset names
 PLATFORM_ASSETS = {
@@ -23,21 +60,65 @@ PLATFORM_ASSETS = {
     "osx and arm64": "ralph-cli-aarch64-apple-darwin.tar.xz",
 }
 
+# Recipe rewrite patterns, compiled once at import
+_VERSION_RE = re.compile(r'version: "([^"]+)"')
+_URL_RE = re.compile(
+    r'(https://github\.com/mikeyobrien/ralph-orchestrator/releases/download/v)[^/]+/'
+)
+_NUMBER_RE = re.compile(r'number: \d+')
+
+
+def _load_cache() -> dict:
+    """Load the cached ETag/version/checksums from the previous run."""
+    try:
+        return _json_loads(CACHE_PATH.read_bytes())
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(version: str, checksums: dict[str, str]) -> None:
+    """Persist the fresh ETag with the version and checksums it corresponds to."""
+    if _fresh_etag:
+        CACHE_PATH.write_text(
+            json.dumps({"etag": _fresh_etag, "version": version, "checksums": checksums})
+        )
 
-def get_latest_release(version_arg: str | None = None) -> tuple[str, dict[str, str]]:
-    """Get latest release version and asset URLs from GitHub."""
+
+def get_latest_release(version_arg: str | None = None) -> tuple[str, dict[str, str] | None]:
+    """Get latest release version and asset URLs from GitHub.
+
+    Returns (version, assets); assets is None when GitHub reports the release
+    unchanged since the last run, in which case the cached checksums apply.
+    """
+    import urllib.error
+    import urllib.request
+
+    global _fresh_etag
+
+    headers = {"Accept": "application/vnd.github.v3+json"}
+    cache = {}
     if version_arg:
         # Fetch specific version
         tag = f"v{version_arg}" if not version_arg.startswith("v") else version_arg
         api_url = f"https://api.github.com/repos/{GITHUB_REPO}/releases/tags/{tag}"
     else:
-        # Fetch latest release
+        # Fetch latest release, revalidating against the previous run's ETag
         api_url = f"https://api.github.com/repos/{GITHUB_REPO}/releases/latest"
+        cache = _load_cache()
+        if cache.get("etag"):
+            headers["If-None-Match"] = cache["etag"]
 
     try:
-        req = urllib.request.Request(api_url, headers={"Accept": "application/vnd.github.v3+json"})
-        with urllib.request.urlopen(req) as response:
-            release = json.loads(response.read().decode())
+        req = urllib.request.Request(api_url, headers=headers)
+        with _opener().open(req) as response:
+            release = _json_loads(response.read())
+            _fresh_etag = response.headers.get("ETag")
+    except urllib.error.HTTPError as e:
+        if e.code == 304 and cache.get("version"):
+            print("Release unchanged since last run (HTTP 304), using cached checksums")
+            return cache["version"], None
+        print(f"Failed to fetch release info: {e}")
+        sys.exit(1)
     except Exception as e:
         print(f"Failed to fetch release info: {e}")
         sys.exit(1)
@@ -48,90 +129,211 @@ def get_latest_release(version_arg: str | None = None) -> tuple[str, dict[str, s
     return version, assets
 
 
+def _is_sha256(value: str) -> bool:
+    """Check for exactly 64 hex characters without invoking the regex engine."""
+    if len(value) != 64:
+        return False
+    try:
+        int(value, 16)
+    except ValueError:
+        return False
+    return True
+
+
+@lru_cache(maxsize=None)
 def get_sha256(url: str) -> str:
-    """Fetch SHA256 checksum from .sha256 file."""
+    """Fetch SHA256 checksum from .sha256 file; one fetch per distinct URL."""
     sha_url = f"{url}.sha256"
     try:
-        with urllib.request.urlopen(sha_url) as response:
-            content = response.read().decode().strip()
-            # Format is: "hash *filename" or "hash  filename"
-            return content.split()[0]
+        with _opener().open(sha_url) as response:
+            # Format is: "hash *filename" or "hash  filename" — the hash is
+            # always the first 64 bytes, so read just those
+            sha256 = response.read(64).decode("ascii")
     except Exception as e:
         print(f"Failed to fetch SHA256 from {sha_url}: {e}")
         sys.exit(1)
+    if not _is_sha256(sha256):
+        print(f"Malformed SHA256 response from {sha_url}: {sha256!r}")
+        sys.exit(1)
+    return sha256
+
+
+def verify_asset(url: str, expected: str) -> None:
+    """Download an asset and check its SHA256 against the published value.
+
+    hashlib.sha256 dispatches to the hardware SHA extensions via OpenSSL, so
+    the hash pass is effectively download-bandwidth bound.
+    """
+    import hashlib
+
+    digest = hashlib.sha256()
+    try:
+        with _opener().open(url) as response:
+            while chunk := response.read(1 << 16):
+                digest.update(chunk)
+    except Exception as e:
+        print(f"Failed to download {url} for verification: {e}")
+        sys.exit(1)
+    actual = digest.hexdigest()
+    if actual != expected:
+        print(f"Checksum mismatch for {url.split('/')[-1]}: expected {expected}, got {actual}")
+        sys.exit(1)
 
 
-def update_recipe(version: str, checksums: dict[str, str]) -> None:
-    """Update the recipe.yaml file with new version and checksums."""
+def read_recipe() -> str:
+    """Read the recipe once up front; everything downstream works on the text."""
     if not RECIPE_PATH.exists():
         print(f"Recipe file not found: {RECIPE_PATH}")
         sys.exit(1)
+    return RECIPE_PATH.read_text()
+
 
-    recipe = RECIPE_PATH.read_text()
+def update_recipe(version: str, checksums: dict[str, str], recipe: str) -> None:
+    """Update the recipe text with new version and checksums, writing back if changed."""
+    original = recipe
 
     # Check current version
-    current_version_match = re.search(r'version: "([^"]+)"', recipe)
+    current_version_match = _VERSION_RE.search(recipe)
     current_version = current_version_match.group(1) if current_version_match else None
 
+    # Collect every (start, end, replacement) edit against the original text,
+    # then emit the result with a single join — one pass of byte copying and
+    # one output allocation instead of a fresh full-size string per rewrite
+    edits = []
+
     # Update version in package section
-    recipe = re.sub(r'version: "[^"]+"', f'version: "{version}"', recipe, count=1)
+    if current_version_match:
+        edits.append((current_version_match.start(1), current_version_match.end(1), version))
 
-    # Update version in all source URLs
-    recipe = re.sub(
-        r'(https://github\.com/mikeyobrien/ralph-orchestrator/releases/download/v)[^/]+/',
-        rf'\g<1>{version}/',
-        recipe
-    )
+    # Update version in all source URLs (the match ends just after the
+    # trailing slash, so the span between covers only the version)
+    for match in _URL_RE.finditer(recipe):
+        edits.append((match.end(1), match.end() - 1, version))
 
-    # Update checksums for each platform
-    # The format is:
+    # Update checksums for each platform. The format is:
     #   - if: linux and x86_64
     #     then:
     #       url: ...
     #       sha256: <checksum>
+    # Each block is located with plain substring scans (a C-level memchr loop,
+    # no regex engine).
     for condition, sha256 in checksums.items():
-        # Match sha256 line that follows a condition block
-        # We look for the pattern: if: <condition>\n    then:\n      url: ...\n      sha256: <hash>
-        pattern = rf'(if: {re.escape(condition)}\s+then:\s+url: [^\n]+\s+sha256: )[a-f0-9]+'
-        recipe = re.sub(pattern, rf'\g<1>{sha256}', recipe)
+        block_idx = recipe.find(f"if: {condition}")
+        if block_idx == -1:
+            continue
+        sha_idx = recipe.find("sha256: ", block_idx)
+        if sha_idx == -1:
+            continue
+        start = sha_idx + len("sha256: ")
+        end = recipe.find("\n", start)
+        if end == -1:
+            end = len(recipe)
+        # Only splice over something that really is a hash, so a mislocated
+        # block can't corrupt unrelated lines
+        if not _is_sha256(recipe[start:end]):
+            continue
+        edits.append((start, end, sha256))
 
     # Reset build number if version changed
     if current_version != version:
-        recipe = re.sub(r'number: \d+', 'number: 0', recipe)
+        number_match = _NUMBER_RE.search(recipe)
+        if number_match:
+            edits.append((number_match.start(), number_match.end(), "number: 0"))
         print(f"Updated package version to {version} and reset build number to 0")
     else:
         print(f"Version {version} is already current, keeping existing build number")
 
-    RECIPE_PATH.write_text(recipe)
+    edits.sort()
+    parts = []
+    pos = 0
+    for start, end, replacement in edits:
+        parts.append(recipe[pos:start])
+        parts.append(replacement)
+        pos = end
+    parts.append(recipe[pos:])
+    recipe = "".join(parts)
+
+    if recipe != original:
+        RECIPE_PATH.write_text(recipe)
 
 
 def main():
     """Main function to update ralph-orchestrator recipe."""
     print("Updating ralph-orchestrator package...")
 
+    parser = argparse.ArgumentParser(description="Update the ralph-orchestrator recipe")
+    parser.add_argument("version", nargs="?", help="explicit version (skips the latest lookup)")
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="download each tarball and check it against the published checksum",
+    )
+    args = parser.parse_args()
+
+    recipe = read_recipe()
+
     # Get version from command line or fetch latest
-    version_arg = sys.argv[1] if len(sys.argv) > 1 else None
+    version_arg = args.version
     version, assets = get_latest_release(version_arg)
     print(f"Target version: {version}")
 
-    # Fetch checksums for each platform
-    checksums = {}
-    for condition, asset_name in PLATFORM_ASSETS.items():
-        if asset_name not in assets:
-            print(f"Warning: Asset {asset_name} not found in release")
-            continue
+    # Skip the checksum fetches entirely when the recipe is already at this version
+    current_version_match = _VERSION_RE.search(recipe)
+    if current_version_match and current_version_match.group(1) == version:
+        print(f"Version {version} is already current, nothing to update")
+        return
 
-        print(f"Fetching checksum for {asset_name}...")
-        sha256 = get_sha256(assets[asset_name])
-        checksums[condition] = sha256
-        print(f"  {sha256}")
+    if assets is None:
+        # Unchanged release; reuse the checksums fetched last run
+        checksums = _load_cache().get("checksums", {})
+    else:
+        # A release missing any platform asset would leave the recipe
+        # half-updated, so check the full set before any checksum fetches
+        missing = [name for name in PLATFORM_ASSETS.values() if name not in assets]
+        if missing:
+            print(f"Missing release assets: {', '.join(missing)}")
+            sys.exit(1)
+
+        # Fetch checksums for each platform; the .sha256 fetches are round-trip
+        # bound, so run them all concurrently
+        checksums = {}
+        targets = {}
+        for condition, asset_name in PLATFORM_ASSETS.items():
+            print(f"Fetching checksum for {asset_name}...")
+            targets[condition] = assets[asset_name]
+
+        with ThreadPoolExecutor(max_workers=len(PLATFORM_ASSETS)) as executor:
+            futures = {
+                executor.submit(get_sha256, url): condition for condition, url in targets.items()
+            }
+            for future in as_completed(futures):
+                condition = futures[future]
+                sha256 = future.result()
+                checksums[condition] = sha256
+                print(f"  {PLATFORM_ASSETS[condition]}: {sha256}")
+
+        if args.verify:
+            # Re-download the tarballs and hash them locally, in parallel
+            print("Verifying published checksums against the tarballs...")
+            with ThreadPoolExecutor(max_workers=len(PLATFORM_ASSETS)) as executor:
+                futures = {
+                    executor.submit(verify_asset, url, checksums[condition]): condition
+                    for condition, url in targets.items()
+                    if condition in checksums
+                }
+                for future in as_completed(futures):
+                    future.result()
+                    print(f"  Verified {PLATFORM_ASSETS[futures[future]]}")
 
     if not checksums:
         print("No checksums found, cannot update recipe")
         sys.exit(1)
 
+    if not version_arg and assets is not None:
+        _save_cache(version, checksums)
+
     # Update the recipe
-    update_recipe(version, checksums)
+    update_recipe(version, checksums, recipe)
 
     print("ralph-orchestrator package update complete!")
 